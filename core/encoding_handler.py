@@ -6,11 +6,16 @@
 防止多字节字符被截断导致乱码。
 """
 
+import binascii
 import codecs
-import re
 from typing import Tuple
 
 
+# 非十六进制字符的删除表（配合 bytes.translate 使用）
+_HEX_DIGITS = b'0123456789abcdefABCDEF'
+_NON_HEX_BYTES = bytes(i for i in range(256) if i not in _HEX_DIGITS)
+
+
 class EncodingHandler:
     """
     编码处理器
@@ -27,7 +32,7 @@ class EncodingHandler:
             encoding: 编码方式 ('gbk' 或 'utf-8')
         """
         self._encoding = encoding.lower()
-        self._decoder = codecs.getincrementaldecoder(self._encoding)('ignore')
+        self.reset()
     
     @property
     def encoding(self) -> str:
@@ -49,7 +54,13 @@ class EncodingHandler:
     
     def reset(self):
         """重置解码器状态（清空缓冲区）"""
-        self._decoder = codecs.getincrementaldecoder(self._encoding)('ignore')
+        # UTF-8 直接调用 C 层的 codecs.utf_8_decode，自行缓存不完整字符，
+        # 省去 Python 实现的 BufferedIncrementalDecoder 包装及 getstate 开销
+        self._is_utf8 = codecs.lookup(self._encoding).name == 'utf-8'
+        self._decoder = None if self._is_utf8 else \
+            codecs.getincrementaldecoder(self._encoding)('ignore')
+        self._pending = b''  # UTF-8 路径缓存的不完整字符
+        self._has_pending = False  # 是否缓存了不完整的多字节字符
     
     def decode(self, data: bytes, final: bool = False) -> str:
         """
@@ -57,6 +68,7 @@ class EncodingHandler:
         
         使用增量解码器，自动处理不完整的多字节字符。
         不完整的字符会被缓存，等待后续数据补全。
+        纯 ASCII 数据且无缓存时直接解码，跳过增量解码器。
         
         Args:
             data: 输入字节数据
@@ -65,12 +77,29 @@ class EncodingHandler:
         Returns:
             解码后的文本
         """
+        # ASCII 快速路径：GBK/UTF-8 均兼容 ASCII
+        if not self._has_pending and data.isascii():
+            return data.decode('ascii')
+        
+        if self._is_utf8:
+            return self._decode_utf8(data, final)
+        
         try:
-            return self._decoder.decode(data, final)
+            text = self._decoder.decode(data, final)
+            self._has_pending = bool(self._decoder.getstate()[0])
+            return text
         except Exception:
             # 解码失败时尝试替换错误字符
             self.reset()
             return data.decode(self._encoding, errors='replace')
+    
+    def _decode_utf8(self, data: bytes, final: bool) -> str:
+        """UTF-8 增量解码，末尾不完整的字符留到下一块数据"""
+        buffer = self._pending + data if self._pending else data
+        text, consumed = codecs.utf_8_decode(buffer, 'ignore', final)
+        self._pending = buffer[consumed:]
+        self._has_pending = bool(self._pending)
+        return text
 
 
 def bytes_to_hex(data: bytes) -> str:
@@ -83,7 +112,8 @@ def bytes_to_hex(data: bytes) -> str:
     Returns:
         格式化的 HEX 字符串 (如 "AA BB CC ")
     """
-    return ' '.join(f'{b:02X}' for b in data) + ' ' if data else ''
+    # bytes.hex 为 C 实现 (Python 3.8+)，无需逐字节格式化
+    return data.hex(' ').upper() + ' ' if data else ''
 
 
 def hex_to_bytes(hex_str: str) -> bytes:
@@ -100,25 +130,18 @@ def hex_to_bytes(hex_str: str) -> bytes:
         解析后的字节数据
     """
     # 清除非法字符，只保留 0-9 A-F a-f
-    clean_str = re.sub(r'[^A-Fa-f0-9]', '', hex_str)
+    # 先丢弃非 ASCII 字符，再用删除表一次性过滤，全程在 C 层完成
+    clean = hex_str.encode('ascii', 'ignore').translate(None, _NON_HEX_BYTES)
     
-    if not clean_str:
+    if not clean:
         return bytes()
     
     # 确保偶数长度
-    if len(clean_str) % 2 != 0:
-        clean_str = clean_str + '0'
-    
-    # 将字符两两分组并转换为字节
-    result = []
-    for i in range(0, len(clean_str), 2):
-        byte_str = clean_str[i:i+2]
-        try:
-            result.append(int(byte_str, 16))
-        except ValueError:
-            pass
+    if len(clean) % 2 != 0:
+        clean += b'0'
     
-    return bytes(result)
+    # 直接解析过滤后的字节串，省去 bytes.fromhex 所需的 str 中间副本
+    return binascii.a2b_hex(clean)
 
 
 def text_to_bytes(text: str, encoding: str = 'gbk') -> bytes:
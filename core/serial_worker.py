@@ -1,49 +1,121 @@
 # -*- coding: utf-8 -*-
 """
-串口工作线程模块
+串口工作模块
 
-使用 QThread 实现串口数据的异步接收，通过 pyqtSignal 将数据传递给 UI 线程。
+使用 QtSerialPort 实现串口数据的异步接收：由操作系统的 I/O 通知驱动
+readyRead 信号，无需轮询线程。SerialWorker 与界面同在 GUI 线程，
+HEX/文本格式化也在 GUI 线程的 readyRead 槽中完成（C 层实现，开销很小），
+结果通过 pyqtSignal 传递给 UI。
 """
 
+import time
 from typing import Optional
-import serial
-from serial.tools import list_ports
-from PyQt5.QtCore import QThread, pyqtSignal, QMutex
+from PyQt5.QtCore import QObject, QIODevice, pyqtSignal
+from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
 
+from core.encoding_handler import EncodingHandler, bytes_to_hex
 
-class SerialWorker(QThread):
+
+# 可用串口列表缓存有效期（秒），枚举串口在 Windows 上需要遍历 SetupAPI
+PORTS_CACHE_TTL = 2.0
+_PORTS_CACHE = {'expires': 0.0, 'ports': []}
+
+# 视为串口断开的错误：设备拔出、读取失败（Windows 下出错后不再继续读取），
+# 以及 Qt 未能映射为 ResourceError 的拔出错误码
+_DISCONNECT_ERRORS = (
+    QSerialPort.ResourceError,
+    QSerialPort.ReadError,
+    QSerialPort.UnknownError
+)
+
+# 数据位映射
+_DATA_BITS = {
+    5: QSerialPort.Data5,
+    6: QSerialPort.Data6,
+    7: QSerialPort.Data7,
+    8: QSerialPort.Data8
+}
+
+# 停止位映射
+_STOP_BITS = {
+    1: QSerialPort.OneStop,
+    1.5: QSerialPort.OneAndHalfStop,
+    2: QSerialPort.TwoStop
+}
+
+# 校验位映射
+_PARITY = {
+    'N': QSerialPort.NoParity,
+    'O': QSerialPort.OddParity,
+    'E': QSerialPort.EvenParity
+}
+
+
+class SerialWorker(QObject):
     """
-    串口工作线程
+    串口工作对象
     
-    负责在独立线程中进行串口数据的读取，避免阻塞主界面。
-    通过信号机制将接收到的数据传递给 UI 线程。
+    封装 QSerialPort，负责串口的打开、关闭、发送，以及接收数据的格式化。
+    与界面同在 GUI 线程，由 readyRead 信号驱动读取，不占用额外线程。
     
     Signals:
-        data_received: 接收到数据时发出，携带字节数据
+        data_received: 接收到数据时发出，携带原始字节数据（界面未使用，
+            保留给外部调用方；格式化本身就需要这份数据，无连接时不产生额外开销）
+        formatted_received: 接收到数据时发出，携带按接收模式格式化后的文本
         error_occurred: 发生错误时发出，携带错误信息
         port_disconnected: 串口断开连接时发出
     """
     
     # 定义信号
-    data_received = pyqtSignal(bytes)  # 数据接收信号
+    data_received = pyqtSignal(bytes)  # 原始数据信号（供外部使用）
+    formatted_received = pyqtSignal(str)  # 格式化文本信号
     error_occurred = pyqtSignal(str)   # 错误信号
     port_disconnected = pyqtSignal()   # 串口断开信号
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self._serial: Optional[serial.Serial] = None
-        self._running = False
-        self._mutex = QMutex()
+        self._serial = QSerialPort(self)
+        self._serial.readyRead.connect(self._on_ready_read)
+        self._serial.errorOccurred.connect(self._on_serial_error)
+        
+        # 接收格式化状态
+        self._hex_mode = True
+        self._encoding_handler = EncodingHandler('gbk')
     
     @property
-    def serial_port(self) -> Optional[serial.Serial]:
+    def serial_port(self) -> Optional[QSerialPort]:
         """获取串口对象"""
-        return self._serial
+        return self._serial if self._serial.isOpen() else None
     
     @property
     def is_open(self) -> bool:
         """检查串口是否打开"""
-        return self._serial is not None and self._serial.is_open
+        return self._serial.isOpen()
+    
+    def set_receive_format(self, hex_mode: bool, encoding: str):
+        """
+        设置接收数据的格式化方式
+        
+        从 HEX 模式切换到文本模式时会重置解码器。
+        
+        Args:
+            hex_mode: 是否以 HEX 模式显示
+            encoding: 文本模式下的编码 ('gbk' 或 'utf8')
+        """
+        if self._hex_mode and not hex_mode:
+            self._encoding_handler.reset()
+        self._hex_mode = hex_mode
+        self._encoding_handler.encoding = encoding
+    
+    def reset_decoder(self):
+        """重置文本解码器状态（清空缓冲区）"""
+        self._encoding_handler.reset()
+    
+    def _format_data(self, data: bytes) -> str:
+        """按当前接收模式将字节数据格式化为文本"""
+        if self._hex_mode:
+            return bytes_to_hex(data)
+        return self._encoding_handler.decode(data)
     
     def open_port(self, port_name: str, baud_rate: int, data_bits: int,
                   stop_bits: float, parity: str) -> bool:
@@ -60,45 +132,22 @@ class SerialWorker(QThread):
         Returns:
             是否成功打开
         """
-        try:
-            # 停止位映射
-            stop_bits_map = {
-                1: serial.STOPBITS_ONE,
-                1.5: serial.STOPBITS_ONE_POINT_FIVE,
-                2: serial.STOPBITS_TWO
-            }
-            
-            # 校验位映射
-            parity_map = {
-                'N': serial.PARITY_NONE,
-                'O': serial.PARITY_ODD,
-                'E': serial.PARITY_EVEN
-            }
-            
-            self._serial = serial.Serial(
-                port=port_name,
-                baudrate=baud_rate,
-                bytesize=data_bits,
-                stopbits=stop_bits_map.get(stop_bits, serial.STOPBITS_ONE),
-                parity=parity_map.get(parity, serial.PARITY_NONE),
-                timeout=0.1  # 100ms 超时
-            )
-            return True
-        except serial.SerialException as e:
-            self.error_occurred.emit(f"串口打开失败: {str(e)}")
+        self._serial.setPortName(port_name)
+        self._serial.setBaudRate(baud_rate)
+        self._serial.setDataBits(_DATA_BITS.get(data_bits, QSerialPort.Data8))
+        self._serial.setStopBits(_STOP_BITS.get(stop_bits, QSerialPort.OneStop))
+        self._serial.setParity(_PARITY.get(parity, QSerialPort.NoParity))
+        self._serial.setFlowControl(QSerialPort.NoFlowControl)
+        
+        if not self._serial.open(QIODevice.ReadWrite):
+            self.error_occurred.emit(f"串口打开失败: {self._serial.errorString()}")
             return False
+        return True
     
     def close_port(self):
         """关闭串口"""
-        self._running = False
-        self.wait(500)  # 等待线程结束
-        
-        if self._serial and self._serial.is_open:
-            try:
-                self._serial.close()
-            except Exception:
-                pass
-        self._serial = None
+        if self._serial.isOpen():
+            self._serial.close()
     
     def write_data(self, data: bytes) -> bool:
         """
@@ -113,55 +162,51 @@ class SerialWorker(QThread):
         if not self.is_open:
             return False
         
-        try:
-            self._mutex.lock()
-            self._serial.write(data)
-            self._mutex.unlock()
-            return True
-        except serial.SerialException as e:
-            self._mutex.unlock()
-            self.error_occurred.emit(f"发送失败: {str(e)}")
+        # write 只写入 Qt 的发送缓冲区，实际发送失败由 errorOccurred 报告
+        if self._serial.write(data) < 0:
+            self.error_occurred.emit(f"发送失败: {self._serial.errorString()}")
             return False
+        return True
     
-    def run(self):
-        """线程运行函数 - 持续读取串口数据"""
-        self._running = True
+    def _on_ready_read(self):
+        """readyRead 槽函数 - 读取缓冲区中的全部数据"""
+        data = self._serial.readAll().data()
+        if not data:
+            return
         
-        while self._running and self._serial:
-            try:
-                if self._serial.is_open:
-                    # 检查是否有数据可读
-                    if self._serial.in_waiting > 0:
-                        self._mutex.lock()
-                        data = self._serial.read(self._serial.in_waiting)
-                        self._mutex.unlock()
-                        if data:
-                            self.data_received.emit(data)
-                else:
-                    # 串口已断开
-                    self.port_disconnected.emit()
-                    break
-            except serial.SerialException:
-                # 串口异常断开
-                self.port_disconnected.emit()
-                break
-            except Exception:
-                pass
-            
-            # 短暂休眠，避免 CPU 占用过高
-            self.msleep(10)
+        self.data_received.emit(data)
+        text = self._format_data(data)
+        if text:
+            self.formatted_received.emit(text)
     
-    def stop(self):
-        """停止线程"""
-        self._running = False
+    def _on_serial_error(self, error):
+        """串口错误处理，读取类错误按断开处理，发送失败仅提示"""
+        if not self._serial.isOpen():
+            return
+        
+        if error in _DISCONNECT_ERRORS:
+            self.port_disconnected.emit()
+        elif error == QSerialPort.WriteError:
+            self.error_occurred.emit(f"发送失败: {self._serial.errorString()}")
 
 
 def get_available_ports() -> list:
     """
     获取可用串口列表
     
+    结果会缓存 PORTS_CACHE_TTL 秒，设备插拔时应调用 invalidate_port_cache。
+    
     Returns:
         串口名称列表
     """
-    ports = list_ports.comports()
-    return [port.device for port in ports]
+    now = time.monotonic()
+    if now >= _PORTS_CACHE['expires']:
+        ports = QSerialPortInfo.availablePorts()
+        _PORTS_CACHE['ports'] = [port.portName() for port in ports]
+        _PORTS_CACHE['expires'] = now + PORTS_CACHE_TTL
+    return list(_PORTS_CACHE['ports'])
+
+
+def invalidate_port_cache():
+    """使可用串口列表缓存失效，下次获取时重新枚举"""
+    _PORTS_CACHE['expires'] = 0.0
@@ -6,7 +6,7 @@
 包含接收区、发送区和配置区。
 """
 
-import ctypes
+import ctypes.wintypes
 from typing import Optional
 
 from PyQt5.QtWidgets import (
@@ -15,11 +15,13 @@ from PyQt5.QtWidgets import (
     QLabel, QSplitter, QMessageBox, QSizePolicy
 )
 from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QTextCursor
 
-from core.serial_worker import SerialWorker, get_available_ports
+from core.serial_worker import (
+    SerialWorker, get_available_ports, invalidate_port_cache
+)
 from core.encoding_handler import (
-    EncodingHandler, bytes_to_hex, hex_to_bytes, text_to_bytes
+    hex_to_bytes, text_to_bytes
 )
 
 
@@ -27,6 +29,23 @@ from core.encoding_handler import (
 WM_DEVICECHANGE = 0x0219
 DBT_DEVICEREMOVECOMPLETE = 0x8004
 
+# Windows 原生消息结构体
+_MSG = ctypes.wintypes.MSG
+
+# 接收区刷新间隔（毫秒），约 30 Hz
+RECEIVE_FLUSH_INTERVAL = 33
+
+# 接收区容量上限：HEX 模式没有换行，仅限制行数不够，同时限制字符数
+RECEIVE_MAX_BLOCKS = 5000
+RECEIVE_MAX_CHARS = 300000
+
+# 光标移动到文档末尾
+_END = QTextCursor.End
+
+# 模式/编码下拉框选项，槽函数直接按索引取值
+_MODES = ('HEX模式', '文本模式')
+_CODINGS = ('GBK', 'UTF-8')
+
 
 class MainWindow(QMainWindow):
     """
@@ -40,30 +59,29 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        # 初始化串口工作线程
+        # 初始化串口工作对象（与界面同在 GUI 线程，由 readyRead 驱动）
         self._serial_worker = SerialWorker()
-        self._serial_worker.data_received.connect(self._on_data_received)
+        self._serial_worker.formatted_received.connect(self._on_data_received)
         self._serial_worker.error_occurred.connect(self._on_error)
         self._serial_worker.port_disconnected.connect(self._on_port_disconnected)
         
-        # 初始化编码处理器
-        self._encoding_handler = EncodingHandler('gbk')
-        
         # 模式和编码状态（移植自 C#）
         self._receive_mode = 'HEX模式'
         self._receive_coding = 'GBK'
         self._send_mode = 'HEX模式'
         self._send_coding = 'GBK'
         
+        # 接收区待显示文本，由定时器合并后一次性追加
+        self._pending_text = []
+        self._flush_timer = QTimer()
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(RECEIVE_FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self._flush_receive)
+        
         # 初始化 UI
         self._init_ui()
         self._init_connections()
         self._init_default_values()
-        
-        # 定时器用于检测串口状态（备用方案）
-        self._check_timer = QTimer()
-        self._check_timer.timeout.connect(self._check_port_status)
-        self._check_timer.start(1000)  # 每秒检查一次
     
     def _init_ui(self):
         """初始化界面布局（移植自 Form1.Designer.cs）"""
@@ -102,6 +120,9 @@ class MainWindow(QMainWindow):
         self.tb_receive.setReadOnly(True)
         self.tb_receive.setFont(QFont('Consolas', 10))
         self.tb_receive.setLineWrapMode(QTextEdit.WidgetWidth)
+        # 限制文档大小并关闭撤销栈，避免长时间接收后追加越来越慢
+        self.tb_receive.setUndoRedoEnabled(False)
+        self.tb_receive.document().setMaximumBlockCount(RECEIVE_MAX_BLOCKS)
         receive_layout.addWidget(self.tb_receive, 1)
         
         # 接收区按钮行
@@ -202,14 +223,14 @@ class MainWindow(QMainWindow):
         
         receive_config_layout.addWidget(QLabel('接收模式'), 0, 0)
         self.cb_receive_mode = QComboBox()
-        self.cb_receive_mode.addItems(['HEX模式', '文本模式'])
+        self.cb_receive_mode.addItems(_MODES)
         self.cb_receive_mode.setFont(QFont('Microsoft YaHei', 9))
         self.cb_receive_mode.setMinimumWidth(130)
         receive_config_layout.addWidget(self.cb_receive_mode, 0, 1)
         
         receive_config_layout.addWidget(QLabel('文本编码'), 1, 0)
         self.cb_receive_coding = QComboBox()
-        self.cb_receive_coding.addItems(['GBK', 'UTF-8'])
+        self.cb_receive_coding.addItems(_CODINGS)
         self.cb_receive_coding.setEnabled(False)
         self.cb_receive_coding.setFont(QFont('Microsoft YaHei', 9))
         self.cb_receive_coding.setMinimumWidth(130)
@@ -224,14 +245,14 @@ class MainWindow(QMainWindow):
         
         send_config_layout.addWidget(QLabel('发送模式'), 0, 0)
         self.cb_send_mode = QComboBox()
-        self.cb_send_mode.addItems(['HEX模式', '文本模式'])
+        self.cb_send_mode.addItems(_MODES)
         self.cb_send_mode.setFont(QFont('Microsoft YaHei', 9))
         self.cb_send_mode.setMinimumWidth(130)
         send_config_layout.addWidget(self.cb_send_mode, 0, 1)
         
         send_config_layout.addWidget(QLabel('文本编码'), 1, 0)
         self.cb_send_coding = QComboBox()
-        self.cb_send_coding.addItems(['GBK', 'UTF-8'])
+        self.cb_send_coding.addItems(_CODINGS)
         self.cb_send_coding.setEnabled(False)
         self.cb_send_coding.setFont(QFont('Microsoft YaHei', 9))
         self.cb_send_coding.setMinimumWidth(130)
@@ -320,9 +341,6 @@ class MainWindow(QMainWindow):
         parity = parity_map.get(self.cb_parity.currentText(), 'N')
         
         if self._serial_worker.open_port(port_name, baud_rate, data_bits, stop_bits, parity):
-            # 启动接收线程
-            self._serial_worker.start()
-            
             # 更新 UI 状态
             self.btn_open.setText('关闭串口')
             self.btn_open.setStyleSheet('background-color: #ffb6c1;')
@@ -337,8 +355,11 @@ class MainWindow(QMainWindow):
         """关闭串口（移植自 CloseSerialPort）"""
         self._serial_worker.close_port()
         
+        # 显示已接收但尚未刷新的数据
+        self._flush_receive()
+        
         # 重置编码处理器
-        self._encoding_handler.reset()
+        self._serial_worker.reset_decoder()
         
         # 更新 UI 状态
         self.btn_open.setText('打开串口')
@@ -379,28 +400,65 @@ class MainWindow(QMainWindow):
     
     def _on_clear_receive(self):
         """清空接收区（移植自 btnClearReceive_Click）"""
+        self._pending_text.clear()
         self.tb_receive.clear()
     
     def _on_clear_send(self):
         """清空发送区（移植自 btnClearSend_Click）"""
         self.tb_send.clear()
     
-    def _on_data_received(self, data: bytes):
+    def _on_data_received(self, text: str):
         """
         处理接收到的数据（移植自 serialPort_DataReceived）
         
+        格式化已由 SerialWorker 在 readyRead 槽中完成（同在 GUI 线程），
+        这里只做缓存，实际追加由 _flush_receive 定时合并完成，
+        避免高波特率下每包都触发一次排版重绘。
+        
         Args:
-            data: 接收到的字节数据
+            text: 已按接收模式格式化的文本
         """
-        if self._receive_mode == 'HEX模式':
-            text = bytes_to_hex(data)
-        else:
-            text = self._encoding_handler.decode(data)
+        self._pending_text.append(text)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+    
+    def _flush_receive(self):
+        """将缓存的接收文本一次性追加到接收区"""
+        if not self._pending_text:
+            return
+        
+        text = ''.join(self._pending_text)
+        self._pending_text.clear()
         
         # 追加文本并滚动到底部
-        self.tb_receive.moveCursor(self.tb_receive.textCursor().End)
+        # 先移到末尾防止用户点击改变了插入位置；插入后光标已在末尾，只需滚动
+        self.tb_receive.moveCursor(_END)
         self.tb_receive.insertPlainText(text)
-        self.tb_receive.moveCursor(self.tb_receive.textCursor().End)
+        self._trim_receive()
+        self.tb_receive.ensureCursorVisible()
+    
+    def _trim_receive(self):
+        """接收区超出字符上限时删除最早的内容（多删 1/4，避免每次刷新都裁剪）"""
+        document = self.tb_receive.document()
+        excess = document.characterCount() - RECEIVE_MAX_CHARS
+        if excess <= 0:
+            return
+        
+        position = excess + RECEIVE_MAX_CHARS // 4
+        if self._receive_mode == 'HEX模式':
+            # 切在完整的 "XX " 之后，避免开头残留半个字节
+            found = document.find(' ', position)
+            if not found.isNull():
+                position = found.selectionEnd()
+        else:
+            # 切在下一行开头
+            block = document.findBlock(position)
+            if block.position() < position and block.next().isValid():
+                position = block.next().position()
+        
+        cursor = QTextCursor(document)
+        cursor.setPosition(position, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
     
     def _on_error(self, message: str):
         """处理错误"""
@@ -413,43 +471,44 @@ class MainWindow(QMainWindow):
     
     def _on_receive_mode_changed(self, index: int):
         """接收模式改变事件（移植自 cbReceiveMode_SelectedIndexChanged）"""
-        mode = self.cb_receive_mode.currentText()
-        if mode == 'HEX模式':
-            self.cb_receive_coding.setEnabled(False)
-            self._receive_mode = 'HEX模式'
-        else:
-            self.cb_receive_coding.setEnabled(True)
-            self._receive_mode = '文本模式'
+        self._receive_mode = _MODES[index]
+        self.cb_receive_coding.setEnabled(index == 1)
         
-        # 重置编码处理器
-        self._encoding_handler.reset()
+        # 从 HEX 模式切换到文本模式时由串口工作对象重置解码器
+        self._update_receive_format()
     
     def _on_receive_coding_changed(self, index: int):
         """接收编码改变事件（移植自 cbReceiveCoding_SelectedIndexChanged）"""
-        coding = self.cb_receive_coding.currentText()
-        self._receive_coding = coding
-        self._encoding_handler.encoding = coding.lower().replace('-', '')
-        self._encoding_handler.reset()
+        self._receive_coding = _CODINGS[index]
+        # 解码器仅在编码实际改变时才会重置
+        self._update_receive_format()
+    
+    def _update_receive_format(self):
+        """将接收模式和编码同步到串口工作对象"""
+        self._serial_worker.set_receive_format(
+            self._receive_mode == 'HEX模式',
+            self._receive_coding.lower().replace('-', '')
+        )
     
     def _on_send_mode_changed(self, index: int):
         """发送模式改变事件（移植自 cbSendMode_SelectedIndexChanged）"""
-        mode = self.cb_send_mode.currentText()
-        if mode == 'HEX模式':
-            self.cb_send_coding.setEnabled(False)
-            self._send_mode = 'HEX模式'
-        else:
-            self.cb_send_coding.setEnabled(True)
-            self._send_mode = '文本模式'
+        self._send_mode = _MODES[index]
+        self.cb_send_coding.setEnabled(index == 1)
     
     def _on_send_coding_changed(self, index: int):
         """发送编码改变事件（移植自 cbSendCoding_SelectedIndexChanged）"""
-        self._send_coding = self.cb_send_coding.currentText()
+        self._send_coding = _CODINGS[index]
     
-    def _check_port_status(self):
-        """定时检查串口状态（备用的热拔插检测方案）"""
-        if self.btn_open.text() == '关闭串口':
-            if not self._serial_worker.is_open:
-                self._close_serial_port()
+    def _check_port_removed(self):
+        """设备移除后检查当前串口是否仍然存在（热拔插检测）"""
+        # QSerialPort 在设备拔出后仍保持打开状态，需按串口名称判断；
+        # 槽函数中的异常会导致 PyQt 直接终止程序，这里兜底
+        try:
+            port = self._serial_worker.serial_port
+            if port is not None and port.portName() not in get_available_ports():
+                self._on_port_disconnected()
+        except Exception:
+            pass
     
     def nativeEvent(self, event_type, message):
         """
@@ -457,27 +516,25 @@ class MainWindow(QMainWindow):
         
         用于检测 USB 设备的热拔插。
         """
-        try:
-            if event_type == b'windows_generic_MSG':
-                msg = ctypes.wintypes.MSG.from_address(message.__int__())
-                if msg.message == WM_DEVICECHANGE:
-                    if msg.wParam == DBT_DEVICEREMOVECOMPLETE:
-                        # 设备移除，检查串口状态
-                        if self.btn_open.text() == '关闭串口':
-                            if not self._serial_worker.is_open:
-                                self._close_serial_port()
-        except Exception:
-            pass
+        if event_type == b'windows_generic_MSG':
+            msg = _MSG.from_address(int(message))
+            if msg.message == WM_DEVICECHANGE:
+                # 设备变化，串口列表缓存失效
+                invalidate_port_cache()
+                if msg.wParam == DBT_DEVICEREMOVECOMPLETE:
+                    # 设备移除，退出原生事件处理后再检查（断开时会弹出模态提示框）
+                    QTimer.singleShot(0, self._check_port_removed)
         
         return super().nativeEvent(event_type, message)
     
     def closeEvent(self, event):
         """窗口关闭事件"""
-        # 停止定时器
-        self._check_timer.stop()
-        
         # 关闭串口
         if self._serial_worker.is_open:
             self._serial_worker.close_port()
         
+        # 关闭串口后再停止定时器并丢弃待显示文本，避免被重新启动
+        self._flush_timer.stop()
+        self._pending_text.clear()
+        
         event.accept()